@@ -0,0 +1,13 @@
+import numpy as np
+
+from visualize_structures_3d import build_graph, layout_3d
+
+
+def test_disconnected_files_stay_together(tmp_path):
+    # Every file is its own component: nothing links the modules together
+    for i in range(8):
+        (tmp_path / f"m{i}.py").write_text("x = 1\ny = [1, 2]\n")
+    G = build_graph(str(tmp_path))
+    P = layout_3d(G)
+    extent = (P.max(axis=0) - P.min(axis=0)).max()
+    assert extent < 5 * np.cbrt(len(G))
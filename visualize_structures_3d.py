@@ -1,8 +1,14 @@
 import ast
+import builtins
 import os
 import sys
 import glob
-import networkx as nx
+from collections import deque
+import numpy as np
+import scipy.sparse as sp
+from scipy.optimize import minimize
+from scipy.sparse.csgraph import connected_components
+from scipy.sparse.linalg import ArpackNoConvergence, eigsh
 import plotly.graph_objs as go
 from typing import Dict, Tuple, List
 from pathlib import Path
@@ -22,20 +28,41 @@ TYPE_COLOR = {
     "import": "rgb(100,200,100)",
     "unknown": "rgb(120,120,120)",
 }
+_KNOWN_KINDS = frozenset(TYPE_COLOR)
+_UNKNOWN_COLOR = TYPE_COLOR["unknown"]
+# Node kinds are stored as indices into KINDS; COLOR_TABLE is indexed the same way
+KINDS = tuple(TYPE_COLOR) + ("builtin-function",)
+KIND_IDX = {k: i for i, k in enumerate(KINDS)}
+COLOR_TABLE = tuple(TYPE_COLOR.get(k, _UNKNOWN_COLOR) for k in KINDS)
+_UNKNOWN_KIND = KIND_IDX["unknown"]
+# ast.unparse is only available on Python 3.9+
+_unparse = getattr(ast, "unparse", None)
+_BUILTIN_NAMES = frozenset(dir(builtins))
+# Above this many nodes, per-point text labels are not drawn in the scene and
+# the layout runs fewer iterations
+LARGE_GRAPH_NODES = 10_000
+
+_GUESS_TYPE = {
+    ast.List: "list",
+    ast.Dict: "dict",
+    ast.Set: "set",
+    ast.Tuple: "tuple",
+}
 
 def guess_type(node) -> str:
-    if isinstance(node, ast.List): return "list"
-    if isinstance(node, ast.Dict): return "dict"
-    if isinstance(node, ast.Set): return "set"
-    if isinstance(node, ast.Tuple): return "tuple"
-    if isinstance(node, ast.Constant):
+    # AST node classes are never subclassed, so exact type checks are safe
+    nt = type(node)
+    t = _GUESS_TYPE.get(nt)
+    if t is not None:
+        return t
+    if nt is ast.Constant:
         t = type(node.value).__name__
-        return t if t in TYPE_COLOR else "unknown"
-    if isinstance(node, ast.Call):
+        return t if t in _KNOWN_KINDS else "unknown"
+    if nt is ast.Call:
         # Simple heuristics for constructors like list(), dict(), set()
-        if isinstance(node.func, ast.Name):
+        if type(node.func) is ast.Name:
             name = node.func.id.lower()
-            return name if name in TYPE_COLOR else "unknown"
+            return name if name in _KNOWN_KINDS else "unknown"
     return "unknown"
 
 def find_python_files(path: str) -> List[str]:
@@ -47,7 +74,303 @@ def find_python_files(path: str) -> List[str]:
         return [str(p) for p in path_obj.rglob('*.py')]
     return []
 
-def build_graph_from_file(py_path: str, G: nx.Graph) -> None:
+# Nodes that no handler looks at and that cannot contain a statement or call
+_LEAF_TYPES = frozenset({
+    ast.Name, ast.Constant, ast.alias,
+    ast.Pass, ast.Break, ast.Continue, ast.Global, ast.Nonlocal,
+})
+
+# Child fields to descend into, per AST node type; filled lazily from _fields
+_CHILD_FIELDS = {}
+
+def _child_fields(t) -> Tuple[str, ...]:
+    # Expression contexts and operators are singleton leaves
+    fields = tuple(f for f in t._fields if f not in ("ctx", "op", "ops"))
+    _CHILD_FIELDS[t] = fields
+    return fields
+
+def iter_nodes(tree):
+    """Yield AST nodes depth-first in source order.
+
+    Leaf nodes in _LEAF_TYPES are never yielded, and expression contexts
+    and operators are not descended into. Calls are still found wherever
+    they are nested, including inside annotations.
+    """
+    stack = deque([tree])
+    AST = ast.AST
+    while stack:
+        node = stack.popleft()
+        yield node
+        t = type(node)
+        fields = _CHILD_FIELDS.get(t)
+        if fields is None:
+            fields = _child_fields(t)
+        children = []
+        for f in fields:
+            v = getattr(node, f, None)
+            if type(v) is list:
+                children.extend(c for c in v if isinstance(c, AST) and type(c) not in _LEAF_TYPES)
+            elif isinstance(v, AST) and type(v) not in _LEAF_TYPES:
+                children.append(v)
+        stack.extendleft(reversed(children))
+
+class CodeGraph:
+    """Undirected graph of code entities keyed by compact integer ids.
+
+    Names are interned once in ``str2id`` and per-node data lives in parallel
+    lists indexed by id; ``kinds`` holds indices into KINDS. Edges are flat
+    endpoint/relation lists; ``_edge_index`` maps each unordered pair to its
+    slot so a repeated edge only updates its relation.
+    """
+
+    def __init__(self):
+        self.str2id: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.kinds: List[int] = []
+        self.labels: List[str] = []
+        self.attrs: List[dict] = []
+        self.edge_src: List[int] = []
+        self.edge_dst: List[int] = []
+        self.edge_rel: List[str] = []
+        self._edge_index: Dict[Tuple[int, int], int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def _new(self, name: str, kind: str, label: str, attrs: dict) -> int:
+        i = len(self.names)
+        self.str2id[name] = i
+        self.names.append(name)
+        self.kinds.append(KIND_IDX.get(kind, _UNKNOWN_KIND))
+        self.labels.append(label or name)
+        self.attrs.append(attrs)
+        return i
+
+    def ensure(self, name: str, kind: str = None, label: str = None, **attrs) -> int:
+        """Return the id for name, creating the node only if it is not there yet"""
+        i = self.str2id.get(name)
+        if i is None:
+            i = self._new(name, kind, label, attrs)
+        return i
+
+    def add_node(self, name: str, kind: str = None, label: str = None, **attrs) -> int:
+        """Intern name, creating the node or updating its data, and return its id"""
+        i = self.str2id.get(name)
+        if i is None:
+            i = self._new(name, kind, label, attrs)
+        else:
+            if kind is not None:
+                self.kinds[i] = KIND_IDX.get(kind, _UNKNOWN_KIND)
+            if label is not None:
+                self.labels[i] = label
+            self.attrs[i].update(attrs)
+        return i
+
+    def add_edge(self, u: int, v: int, relation: str) -> None:
+        # Endpoints are stored lower id first
+        key = (u, v) if u <= v else (v, u)
+        j = self._edge_index.get(key)
+        if j is None:
+            self._edge_index[key] = len(self.edge_src)
+            self.edge_src.append(key[0])
+            self.edge_dst.append(key[1])
+            self.edge_rel.append(relation)
+        else:
+            self.edge_rel[j] = relation
+
+    def edge_arrays(self) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+        """Edge endpoints as (src, dst) id arrays plus relations, in insertion order"""
+        return (np.array(self.edge_src, dtype=np.intp),
+                np.array(self.edge_dst, dtype=np.intp),
+                self.edge_rel)
+
+def _h_import(node, G: CodeGraph, ctx: dict) -> None:
+    module_id = ctx["module_id"]
+    for alias in node.names:
+        import_name = alias.name
+        ctx["imported_names"].add(alias.asname if alias.asname else alias.name)
+        import_id = G.ensure(import_name, kind="import")
+        G.add_edge(module_id, import_id, relation="imports")
+
+def _h_import_from(node, G: CodeGraph, ctx: dict) -> None:
+    if node.module:
+        import_name = node.module
+        # Track individual imported names
+        for alias in node.names:
+            ctx["imported_names"].add(alias.asname if alias.asname else alias.name)
+        import_id = G.ensure(import_name, kind="import")
+        G.add_edge(ctx["module_id"], import_id, relation="imports")
+
+def _h_class(node, G: CodeGraph, ctx: dict) -> None:
+    module_name = ctx["module_name"]
+    source_lines = ctx["source_lines"]
+    class_label = f"{module_name}::{node.name}"
+    docstring = ast.get_docstring(node) or ""
+    # Get base classes for inheritance
+    bases = []
+    for base in node.bases:
+        if isinstance(base, ast.Name):
+            bases.append(base.id)
+
+    # Extract code snippet
+    start_line = node.lineno - 1
+    end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line + 5
+    code_snippet = '\n'.join(source_lines[start_line:min(end_line, start_line + 20)])
+
+    class_id = G.add_node(class_label, kind="class", label=node.name,
+                          docstring=docstring[:100], bases=bases, module=module_name,
+                          code_snippet=code_snippet, lineno=node.lineno)
+    G.add_edge(ctx["module_id"], class_id, relation="contains")
+
+    # Add inheritance edges
+    for base_name in bases:
+        # Try to find base class in graph
+        base_id = G.str2id.get(f"{module_name}::{base_name}")
+        if base_id is not None:
+            G.add_edge(base_id, class_id, relation="inherits")
+        else:
+            # Check other modules
+            class_kind = KIND_IDX['class']
+            for i, (label, kind) in enumerate(zip(G.labels, G.kinds)):
+                if label == base_name and kind == class_kind:
+                    G.add_edge(i, class_id, relation="inherits")
+                    break
+
+    # Link methods
+    for body in node.body:
+        if isinstance(body, ast.FunctionDef):
+            fn_label = f"{class_label}.{body.name}()"
+            fn_docstring = ast.get_docstring(body) or ""
+            # Get function signature
+            params = [arg.arg for arg in body.args.args]
+
+            # Extract code snippet
+            start_line = body.lineno - 1
+            end_line = body.end_lineno if hasattr(body, 'end_lineno') else start_line + 5
+            code_snippet = '\n'.join(source_lines[start_line:min(end_line, start_line + 20)])
+
+            fn_id = G.add_node(fn_label, kind="function", label=f"{body.name}()",
+                               docstring=fn_docstring[:100], params=params, module=module_name,
+                               code_snippet=code_snippet, lineno=body.lineno)
+            G.add_edge(class_id, fn_id, relation="method")
+
+def _h_assign(node, G: CodeGraph, ctx: dict) -> None:
+    module_name = ctx["module_name"]
+    # Left-hand side targets can be multiple
+    val_type = guess_type(node.value)
+    for tgt in node.targets:
+        if isinstance(tgt, ast.Name):
+            ctx["var_types"][tgt.id] = val_type
+            var_id = G.add_node(f"{module_name}::{tgt.id}", kind=val_type, label=tgt.id, module=module_name)
+            G.add_edge(ctx["module_id"], var_id, relation="var")
+
+    # Link keys/items within dicts, lists, sets if literals appear
+    value = node.value
+    if isinstance(value, ast.Dict):
+        for tgt in node.targets:
+            if isinstance(tgt, ast.Name):
+                parent = tgt.id
+                parent_label = f"{module_name}::{parent}"
+                parent_id = G.str2id[parent_label]
+                for k, v in zip(value.keys, value.values):
+                    k_label = _unparse(k) if _unparse else "key"
+                    v_type = guess_type(v)
+                    child_id = G.add_node(f"{parent_label}.{k_label}", kind=v_type,
+                                          label=f"{parent}.{k_label}", module=module_name)
+                    G.add_edge(parent_id, child_id, relation="dict-item")
+    elif isinstance(value, (ast.List, ast.Set, ast.Tuple)):
+        for tgt in node.targets:
+            if isinstance(tgt, ast.Name):
+                parent = tgt.id
+                parent_label = f"{module_name}::{parent}"
+                parent_id = G.str2id[parent_label]
+                for idx, elt in enumerate(value.elts):
+                    v_type = guess_type(elt)
+                    child_id = G.add_node(f"{parent_label}[{idx}]", kind=v_type,
+                                          label=f"{parent}[{idx}]", module=module_name)
+                    G.add_edge(parent_id, child_id, relation="seq-item")
+
+def _h_annassign(node, G: CodeGraph, ctx: dict) -> None:
+    # Annotated assignments
+    if isinstance(node.target, ast.Name):
+        module_name = ctx["module_name"]
+        ann = _unparse(node.annotation) if _unparse else "unknown"
+        val_type = guess_type(node.value) if node.value else ann
+        kind = val_type if val_type in _KNOWN_KINDS else (ann if ann in _KNOWN_KINDS else "unknown")
+        ctx["var_types"][node.target.id] = kind
+        var_id = G.add_node(f"{module_name}::{node.target.id}", kind=kind,
+                            label=node.target.id, module=module_name)
+        G.add_edge(ctx["module_id"], var_id, relation="var")
+
+def _h_call(node, G: CodeGraph, ctx: dict) -> None:
+    # Calls depend on every import in the file, so they are linked after the walk
+    ctx["calls"].append(node)
+
+def _link_call(node, G: CodeGraph, ctx: dict) -> None:
+    # Link variables passed to calls
+    imported_names = ctx["imported_names"]
+    func_name = None
+    is_builtin = False
+
+    if isinstance(node.func, ast.Name):
+        func_name = f"{node.func.id}()"
+        # Check if it's a built-in or imported function
+        is_builtin = node.func.id in imported_names or node.func.id in _BUILTIN_NAMES
+    elif isinstance(node.func, ast.Attribute):
+        func_name = f"{_unparse(node.func)}()" if _unparse else f"{node.func.attr}()"
+        is_builtin = True  # Assume attribute calls are external
+
+    # Extract argument names/types
+    call_args = []
+    if func_name:
+        for arg in node.args:
+            if isinstance(arg, ast.Name):
+                call_args.append(arg.id)
+            elif isinstance(arg, ast.Constant):
+                call_args.append(f"{type(arg.value).__name__}")
+            elif _unparse:
+                call_args.append(_unparse(arg)[:30])
+
+    if func_name:
+        # Only create nodes for built-in functions, not user-defined ones
+        func_id = G.str2id.get(func_name)
+        if func_id is not None:
+            # Node already exists - just update usage info if it's a built-in.
+            # params keep the first call's; usage_example follows the last
+            # call (in source order) that passes arguments
+            if call_args and G.kinds[func_id] == KIND_IDX['builtin-function']:
+                func_attrs = G.attrs[func_id]
+                if 'params' not in func_attrs:
+                    func_attrs['params'] = call_args
+                usage = f"{func_name.replace('()', '')}({', '.join(call_args)})"
+                func_attrs['usage_example'] = usage
+        elif is_builtin:
+            # Only add node if it's a built-in/imported function
+            usage = f"{func_name.replace('()', '')}({', '.join(call_args)})" if call_args else func_name
+            func_id = G.add_node(func_name, kind="builtin-function", label=func_name,
+                                 params=call_args if call_args else [],
+                                 usage_example=usage)
+            G.add_edge(ctx["module_id"], func_id, relation="calls")
+        # Skip creating nodes for user-defined function calls - they're already in the graph from the second pass
+        for arg in node.args:
+            if isinstance(arg, ast.Name):
+                arg_id = G.str2id.get(arg.id)
+                if arg_id is not None:
+                    if func_id is None:
+                        func_id = G.ensure(func_name)
+                    G.add_edge(arg_id, func_id, relation="arg")
+
+# Per-node-type handlers for the single AST pass in build_graph_from_file
+HANDLERS = {
+    ast.Import: _h_import,
+    ast.ImportFrom: _h_import_from,
+    ast.ClassDef: _h_class,
+    ast.Assign: _h_assign,
+    ast.AnnAssign: _h_annassign,
+    ast.Call: _h_call,
+}
+
+def build_graph_from_file(py_path: str, G: CodeGraph) -> None:
     """Build graph from a single Python file"""
     try:
         with open(py_path, "r", encoding="utf-8") as f:
@@ -58,93 +381,33 @@ def build_graph_from_file(py_path: str, G: nx.Graph) -> None:
         return
 
     module_name = os.path.basename(py_path)
-    if not G.has_node(module_name):
-        G.add_node(module_name, kind="module", label=module_name, file_path=py_path)
+    module_id = G.ensure(module_name, kind="module", file_path=py_path)
 
-    # Track variables and their types
-    var_types: Dict[str, str] = {}
-    
-    # Track imported modules and their members
-    imported_names = set()
-
-    # Track imports
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                import_name = alias.name
-                imported_names.add(alias.asname if alias.asname else alias.name)
-                if not G.has_node(import_name):
-                    G.add_node(import_name, kind="import", label=import_name)
-                G.add_edge(module_name, import_name, relation="imports")
-        elif isinstance(node, ast.ImportFrom):
-            if node.module:
-                import_name = node.module
-                # Track individual imported names
-                for alias in node.names:
-                    imported_names.add(alias.asname if alias.asname else alias.name)
-                if not G.has_node(import_name):
-                    G.add_node(import_name, kind="import", label=import_name)
-                G.add_edge(module_name, import_name, relation="imports")
-
-    # Add classes and functions
     source_lines = src.splitlines()
-    for node in ast.walk(tree):
-        if isinstance(node, ast.ClassDef):
-            class_label = f"{module_name}::{node.name}"
-            docstring = ast.get_docstring(node) or ""
-            # Get base classes for inheritance
-            bases = []
-            for base in node.bases:
-                if isinstance(base, ast.Name):
-                    bases.append(base.id)
-            
-            # Extract code snippet
-            start_line = node.lineno - 1
-            end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line + 5
-            code_snippet = '\n'.join(source_lines[start_line:min(end_line, start_line + 20)])
-            
-            G.add_node(class_label, kind="class", label=node.name, 
-                      docstring=docstring[:100], bases=bases, module=module_name,
-                      code_snippet=code_snippet, lineno=node.lineno)
-            G.add_edge(module_name, class_label, relation="contains")
-            
-            # Add inheritance edges
-            for base_name in bases:
-                # Try to find base class in graph
-                base_label = f"{module_name}::{base_name}"
-                if G.has_node(base_label):
-                    G.add_edge(base_label, class_label, relation="inherits")
-                else:
-                    # Check other modules
-                    for node_id in G.nodes():
-                        if G.nodes[node_id].get('label') == base_name and G.nodes[node_id].get('kind') == 'class':
-                            G.add_edge(node_id, class_label, relation="inherits")
-                            break
-            
-            # Link methods
-            for body in node.body:
-                if isinstance(body, ast.FunctionDef):
-                    fn_label = f"{class_label}.{body.name}()"
-                    fn_docstring = ast.get_docstring(body) or ""
-                    # Get function signature
-                    params = [arg.arg for arg in body.args.args]
-                    
-                    # Extract code snippet
-                    start_line = body.lineno - 1
-                    end_line = body.end_lineno if hasattr(body, 'end_lineno') else start_line + 5
-                    code_snippet = '\n'.join(source_lines[start_line:min(end_line, start_line + 20)])
-                    
-                    G.add_node(fn_label, kind="function", label=f"{body.name}()",
-                              docstring=fn_docstring[:100], params=params, module=module_name,
-                              code_snippet=code_snippet, lineno=body.lineno)
-                    G.add_edge(class_label, fn_label, relation="method")
-    
-    # Second pass: Add top-level functions only (not methods inside classes)
+    ctx = {
+        "module_name": module_name,
+        "module_id": module_id,
+        "source_lines": source_lines,
+        # Track variables and their types
+        "var_types": {},
+        # Track imported modules and their members
+        "imported_names": set(),
+        # Call nodes, linked once all imports are known
+        "calls": [],
+    }
+
+    # Single pass: imports, classes (with methods), variables and calls
+    for node in iter_nodes(tree):
+        h = HANDLERS.get(type(node))
+        if h:
+            h(node, G, ctx)
+
+    # Add top-level functions only (not methods inside classes)
     for node in tree.body:
         if isinstance(node, ast.FunctionDef):
             func_label = f"{module_name}::{node.name}()"
             # Skip if already added (shouldn't happen, but check to be safe)
-            if G.has_node(func_label):
+            if func_label in G.str2id:
                 print(f"Skipping duplicate function: {func_label}")
                 continue
             docstring = ast.get_docstring(node) or ""
@@ -155,104 +418,17 @@ def build_graph_from_file(py_path: str, G: nx.Graph) -> None:
             end_line = node.end_lineno if hasattr(node, 'end_lineno') else start_line + 5
             code_snippet = '\n'.join(source_lines[start_line:min(end_line, start_line + 20)])
             
-            G.add_node(func_label, kind="function", label=f"{node.name}()", 
-                      docstring=docstring[:100], params=params, module=module_name,
-                      code_snippet=code_snippet, lineno=node.lineno)
-            G.add_edge(module_name, func_label, relation="contains")
-    
-    # Third pass: Process variables and function calls
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Assign):
-            # Left-hand side targets can be multiple
-            val_type = guess_type(node.value)
-            for tgt in node.targets:
-                if isinstance(tgt, ast.Name):
-                    var_types[tgt.id] = val_type
-                    var_label = f"{module_name}::{tgt.id}"
-                    G.add_node(var_label, kind=val_type, label=tgt.id, module=module_name)
-                    G.add_edge(module_name, var_label, relation="var")
-        elif isinstance(node, ast.AnnAssign):
-            # Annotated assignments
-            if isinstance(node.target, ast.Name):
-                ann = ast.unparse(node.annotation) if hasattr(ast, "unparse") else "unknown"
-                val_type = guess_type(node.value) if node.value else ann
-                kind = val_type if val_type in TYPE_COLOR else (ann if ann in TYPE_COLOR else "unknown")
-                var_types[node.target.id] = kind
-                var_label = f"{module_name}::{node.target.id}"
-                G.add_node(var_label, kind=kind, label=node.target.id, module=module_name)
-                G.add_edge(module_name, var_label, relation="var")
-        elif isinstance(node, ast.Call):
-            # Link variables passed to calls
-            func_name = None
-            is_builtin = False
-            call_args = []
-            
-            # Extract argument names/types
-            for arg in node.args:
-                if isinstance(arg, ast.Name):
-                    call_args.append(arg.id)
-                elif isinstance(arg, ast.Constant):
-                    call_args.append(f"{type(arg.value).__name__}")
-                elif hasattr(ast, 'unparse'):
-                    call_args.append(ast.unparse(arg)[:30])
-            
-            if isinstance(node.func, ast.Name):
-                func_name = f"{node.func.id}()"
-                # Check if it's a built-in or imported function
-                is_builtin = node.func.id in imported_names or node.func.id in dir(__builtins__)
-            elif isinstance(node.func, ast.Attribute):
-                func_name = f"{ast.unparse(node.func)}()" if hasattr(ast, "unparse") else f"{node.func.attr}()"
-                is_builtin = True  # Assume attribute calls are external
-            if func_name:
-                # Only create nodes for built-in functions, not user-defined ones
-                if G.has_node(func_name):
-                    # Node already exists - just update usage info if it's a built-in
-                    if call_args and G.nodes[func_name].get('kind') == 'builtin-function':
-                        if 'params' not in G.nodes[func_name]:
-                            G.nodes[func_name]['params'] = call_args
-                        usage = f"{func_name.replace('()', '')}({', '.join(call_args)})"
-                        G.nodes[func_name]['usage_example'] = usage
-                elif is_builtin:
-                    # Only add node if it's a built-in/imported function
-                    usage = f"{func_name.replace('()', '')}({', '.join(call_args)})" if call_args else func_name
-                    G.add_node(func_name, kind="builtin-function", label=func_name, 
-                              params=call_args if call_args else [], 
-                              usage_example=usage)
-                    G.add_edge(module_name, func_name, relation="calls")
-                # Skip creating nodes for user-defined function calls - they're already in the graph from the second pass
-                for arg in node.args:
-                    if isinstance(arg, ast.Name) and G.has_node(arg.id):
-                        G.add_edge(arg.id, func_name, relation="arg")
+            func_id = G.add_node(func_label, kind="function", label=f"{node.name}()",
+                                 docstring=docstring[:100], params=params, module=module_name,
+                                 code_snippet=code_snippet, lineno=node.lineno)
+            G.add_edge(module_id, func_id, relation="contains")
 
-    # Link keys/items within dicts, lists, sets if literals appear
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Assign) and isinstance(node.value, ast.Dict):
-            for tgt in node.targets:
-                if isinstance(tgt, ast.Name):
-                    parent = tgt.id
-                    parent_label = f"{module_name}::{parent}"
-                    for k, v in zip(node.value.keys, node.value.values):
-                        k_label = ast.unparse(k) if hasattr(ast, "unparse") else "key"
-                        v_type = guess_type(v)
-                        child_name = f"{parent_label}.{k_label}"
-                        G.add_node(child_name, kind=v_type, label=f"{parent}.{k_label}", module=module_name)
-                        if G.has_node(parent_label):
-                            G.add_edge(parent_label, child_name, relation="dict-item")
-        elif isinstance(node, ast.Assign) and isinstance(node.value, (ast.List, ast.Set, ast.Tuple)):
-            for tgt in node.targets:
-                if isinstance(tgt, ast.Name):
-                    parent = tgt.id
-                    parent_label = f"{module_name}::{parent}"
-                    for idx, elt in enumerate(node.value.elts):
-                        v_type = guess_type(elt)
-                        child_name = f"{parent_label}[{idx}]"
-                        G.add_node(child_name, kind=v_type, label=f"{parent}[{idx}]", module=module_name)
-                        if G.has_node(parent_label):
-                            G.add_edge(parent_label, child_name, relation="seq-item")
-
-def build_graph(path: str) -> nx.Graph:
+    for node in ctx["calls"]:
+        _link_call(node, G, ctx)
+
+def build_graph(path: str) -> CodeGraph:
     """Build graph from file or directory of Python files"""
-    G = nx.Graph()
+    G = CodeGraph()
     py_files = find_python_files(path)
     
     if not py_files:
@@ -265,43 +441,153 @@ def build_graph(path: str) -> nx.Graph:
     
     return G
 
-def layout_3d(G: nx.Graph) -> Dict[str, Tuple[float, float, float]]:
-    # Use spring layout in 3D by embedding 2D to 3D
-    pos2d = nx.spring_layout(G, dim=2, k=0.6, seed=42)
-    # Lift into 3D by adding a z jitter
-    positions = {}
-    import random
-    for n, (x, y) in pos2d.items():
-        z = (random.random() - 0.5) * 0.8
-        positions[n] = (x, y, z)
-    return positions
-
-def graph_to_plotly_3d(G: nx.Graph):
-    pos = layout_3d(G)
-
-    # Edges
-    edge_x, edge_y, edge_z = [], [], []
-    for u, v in G.edges():
-        x0, y0, z0 = pos[u]
-        x1, y1, z1 = pos[v]
-        edge_x += [x0, x1, None]
-        edge_y += [y0, y1, None]
-        edge_z += [z0, z1, None]
+def _layout_energy(x: np.ndarray, B: sp.csr_matrix, k: float, C: float,
+                   g: float, block: int):
+    """Spring + repulsion + centring energy of flattened 3D positions, with its gradient.
+
+    E(x) = sum over edges (|x_i - x_j| - k)^2 + C * sum over pairs 1 / |x_i - x_j|
+           + g * sum over nodes |x_i - mean|^2
+    The weak centring term keeps disconnected components from drifting apart.
+    B is the signed (edges x nodes) incidence matrix, so B @ X gives x_i - x_j
+    for every edge and B.T scatters per-edge forces back onto the nodes.
+    """
+    X = x.reshape(-1, 3)
+    n = len(X)
+    grad = np.zeros_like(X)
+
+    # Attraction along edges
+    diff = B @ X
+    d = np.sqrt((diff * diff).sum(axis=1) + 1e-9)
+    energy = ((d - k) ** 2).sum()
+    grad += B.T @ ((2.0 * (d - k) / d)[:, None] * diff)
+
+    # Centring; the mean's own gradient terms sum to zero
+    centred = X - X.mean(axis=0)
+    energy += g * (centred * centred).sum()
+    grad += 2.0 * g * centred
+
+    # All-pairs repulsion, a block of rows at a time to bound memory.
+    # |x_i - x_j|^2 comes from the Gram matrix and sum_j w_ij (x_i - x_j)
+    # from x_i * sum_j w_ij - W @ X, so only (block x n) arrays are built.
+    sq = (X * X).sum(axis=1)
+    for start in range(0, n, block):
+        stop = min(start + block, n)
+        r2 = sq[start:stop, None] + sq[None, :] - 2.0 * (X[start:stop] @ X.T)
+        np.maximum(r2, 1e-9, out=r2)
+        rows = np.arange(stop - start)
+        r2[rows, rows + start] = np.inf
+        # r2 becomes 1/|x_i - x_j| in place, then w = 1/|x_i - x_j|^3
+        np.sqrt(r2, out=r2)
+        inv = np.reciprocal(r2, out=r2)
+        # Each unordered pair is seen twice across all blocks
+        energy += 0.5 * C * inv.sum()
+        w = inv * inv
+        w *= inv
+        grad[start:stop] -= C * (X[start:stop] * w.sum(axis=1)[:, None] - w @ X)
+
+    return energy, grad.ravel()
+
+def _spectral_start(B: sp.csr_matrix, n: int, k: float, rng) -> np.ndarray:
+    """Initial 3D positions from the graph Laplacian's low eigenvectors.
+
+    The three smallest non-trivial eigenvectors already place connected nodes
+    near each other in 3D, so the optimiser starts close to a good layout.
+    Each connected component is embedded on its own, since across components
+    the zero eigenvalue repeats and its eigenvectors only say which component
+    a node is in. A component is scaled to the volume its nodes at spacing k
+    occupy, jittered to separate coincident nodes, and centred at a random
+    point of the whole graph's volume. Components that are too small or have
+    no edges start in a random cube.
+    """
+    extent = k * np.cbrt(n)
+    L = (B.T @ B).tocsr()
+    n_comp, comp = connected_components(L, directed=False)
+    X = np.empty((n, 3))
+    centres = rng.uniform(-extent, extent, size=(n_comp, 3))
+    for c, members in enumerate(np.split(np.argsort(comp, kind='stable'),
+                                         np.cumsum(np.bincount(comp))[:-1])):
+        nc = len(members)
+        half = k * np.cbrt(nc)
+        Y = None
+        if nc > 5:
+            Lc = L[members][:, members].tocsc()
+            if Lc.nnz:
+                try:
+                    # Tiny diagonal shift keeps shift-invert about 0 non-singular
+                    _, V = eigsh(Lc + 1e-6 * sp.identity(nc, format='csc'), k=4, sigma=0, which='LM')
+                    Y = V[:, 1:4]
+                    Y = Y / (np.abs(Y).max(axis=0) + 1e-12) * half
+                    Y += rng.uniform(-0.5 * k, 0.5 * k, size=Y.shape)
+                except (ArpackNoConvergence, RuntimeError):
+                    pass
+        if Y is None:
+            Y = rng.uniform(-half, half, size=(nc, 3))
+        X[members] = Y + centres[c]
+    return X.ravel()
+
+def layout_3d(G: CodeGraph, k: float = 1.0, C: float = 0.5,
+              maxiter: int = 100) -> np.ndarray:
+    """Force-directed 3D layout minimised with L-BFGS over a sparse incidence matrix.
+
+    Returns an (N, 3) array of positions indexed by node id. Repulsion is
+    all-pairs, so each energy evaluation costs O(N^2) and the layout
+    dominates the run time on large graphs.
+    """
+    n = len(G)
+    if n == 0:
+        return np.empty((0, 3))
+    src, dst, _ = G.edge_arrays()
+    keep = src != dst
+    src, dst = src[keep], dst[keep]
+    m = len(src)
+    B = sp.csr_matrix(
+        (np.r_[np.ones(m), -np.ones(m)], (np.r_[np.arange(m), np.arange(m)], np.r_[src, dst])),
+        shape=(m, n),
+    )
+
+    x0 = _spectral_start(B, n, k, np.random.default_rng(42))
+
+    # ~32k pair entries per block keeps the working set cache-resident
+    block = max(1, (1 << 15) // n)
+    # Balancing C * n^2 / R repulsion against g * n * R^2 centring puts the
+    # equilibrium radius at about 2 * k * cbrt(n), the volume n nodes at
+    # spacing k occupy, whether or not the graph is connected
+    g = C / (16.0 * k ** 3)
+    res = minimize(_layout_energy, x0, args=(B, k, C, g, block), jac=True,
+                   method='L-BFGS-B', options={'maxiter': maxiter})
+    return res.x.reshape(n, 3)
+
+def graph_to_plotly_3d(G: CodeGraph):
+    large = len(G) > LARGE_GRAPH_NODES
+    # The all-pairs layout costs seconds per iteration on large graphs, so
+    # they get fewer iterations on top of the spectral start
+    P = layout_3d(G, maxiter=20 if large else 100)
+    names = G.names
+
+    # Edges: one (u, v, NaN) row triple per edge; Plotly breaks lines at NaN
+    src, dst, rels = G.edge_arrays()
+    seg = np.empty((len(src) * 3, 3))
+    seg[0::3] = P[src]
+    seg[1::3] = P[dst]
+    seg[2::3] = np.nan
+    # Plain lists keep the trace JSON readable by the page scripts (NaN -> null)
+    edge_x, edge_y, edge_z = seg.T.tolist()
 
     # build hover texts for edges (repeat for the two endpoints, None for the separator)
-    edge_hover = []
-    for u, v in G.edges():
-        rel = G.edges[u, v].get("relation", "")
-        label = f"{u} → {v}"
-        if rel:
-            label = f"{label} ({rel})"
-        edge_hover += [label, label, None]
+    edge_labels = [f"{names[u]} → {names[v]} ({rel})" if rel else f"{names[u]} → {names[v]}"
+                   for u, v, rel in zip(G.edge_src, G.edge_dst, rels)]
+    edge_hover = [None] * (3 * len(edge_labels))
+    edge_hover[0::3] = edge_labels
+    edge_hover[1::3] = edge_labels
 
     # default edge trace
     default_color = 'rgb(0,100,200)'
     default_opacity = 1.0
 
-    edge_trace = go.Scatter3d(
+    # Traces are plain dicts so plotly validates them once, in go.Figure,
+    # rather than once per go.Scatter3d and again when the figure copies them
+    edge_trace = dict(
+        type='scatter3d',
         x=edge_x, y=edge_y, z=edge_z,
         mode='lines',
         line=dict(color=default_color, width=3),
@@ -411,27 +697,35 @@ def graph_to_plotly_3d(G: nx.Graph):
         }
     ]
     
-    # Nodes grouped by kind for coloring
-    kinds = {}
-    for n, data in G.nodes(data=True):
-        kind = data.get("kind", "unknown")
-        kinds.setdefault(kind, []).append(n)
+    # Nodes grouped by kind for coloring: a stable sort by kind makes every
+    # group a contiguous slice. Traces are emitted in KINDS order so the
+    # legend does not depend on the order nodes were created in
+    kinds_arr = np.array(G.kinds, dtype=np.intp)
+    order = np.argsort(kinds_arr, kind='stable')
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(kinds_arr, minlength=len(KINDS)))))
+    present = np.unique(kinds_arr)
+    P_sorted = P[order]
 
+    labels = G.labels
+    # Rendering a text glyph per point is what makes big 3D scenes sluggish;
+    # large graphs keep their labels in text/hover for the page scripts only
+    node_mode = 'markers' if large else 'markers+text'
     node_traces = []
-    for kind, nodes in kinds.items():
-        xs, ys, zs, texts, hovertexts = [], [], [], [], []
+    for k in present.tolist():
+        kind = KINDS[k]
+        start, end = bounds[k], bounds[k + 1]
+        nodes = order[start:end].tolist()
+        xs, ys, zs = P_sorted[start:end].T.tolist()
+        texts, hovertexts = [], []
         customdata_list = []
         
         for n in nodes:
-            x, y, z = pos[n]
-            node_data = G.nodes[n]
-            xs.append(x)
-            ys.append(y)
-            zs.append(z)
-            texts.append(node_data.get("label", n))
+            node_data = G.attrs[n]
+            label = labels[n]
+            texts.append(label)
             
             # Build hover text with metadata
-            hover_parts = [f"<b>{node_data.get('label', n)}</b>"]
+            hover_parts = [f"<b>{label}</b>"]
             hover_parts.append(f"Type: {kind}")
             if node_data.get('module'):
                 hover_parts.append(f"Module: {node_data.get('module')}")
@@ -449,20 +743,21 @@ def graph_to_plotly_3d(G: nx.Graph):
                 node_data.get('params', []),
                 node_data.get('module', ''),
                 node_data.get('bases', []),
-                node_data.get('label', n),
+                label,
                 node_data.get('code_snippet', ''),
                 node_data.get('lineno', ''),
                 node_data.get('usage_example', '')
             ])
         
-        node_traces.append(go.Scatter3d(
+        node_traces.append(dict(
+            type='scatter3d',
             x=xs, y=ys, z=zs,
-            mode='markers+text',
+            mode=node_mode,
             text=texts,
             textposition='top center',
             hovertext=hovertexts,
             hoverinfo='text',
-            marker=dict(size=6, color=TYPE_COLOR.get(kind, TYPE_COLOR["unknown"]), opacity=0.9),
+            marker=dict(size=6, color=COLOR_TABLE[k], opacity=0.9),
             customdata=customdata_list,
             name=kind
         ))